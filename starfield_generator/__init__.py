@@ -10,9 +10,9 @@ bl_info = {
     "category": "Object",
 }
 
-import math
-import random
-from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
 
 import bpy
 import bmesh
@@ -24,24 +24,28 @@ from bpy.props import (
     PointerProperty,
     StringProperty,
 )
-from mathutils import Vector
+
+from .sampling import StarfieldSettings, sample_starfield
 
 
 STAR_MESH_NAME = "Starfield_StarMesh"
 STAR_MATERIAL_NAME = "Starfield_StarMaterial"
-
-
-@dataclass
-class StarfieldSettings:
-    star_count: int
-    field_radius: float
-    star_size_min: float
-    star_size_max: float
-    base_brightness: float
-    brightness_variation: float
-    collection_name: str
-    clear_existing: bool
-    random_seed: int
+STAR_INSTANCER_NAME = "Starfield_Instancer"
+STAR_OBJECT_NAME = "Starfield_Star"
+BRIGHTNESS_SCALE_NODE_NAME = "Starfield_BrightnessScale"
+BRIGHTNESS_ADD_NODE_NAME = "Starfield_BrightnessAdd"
+# Bump when build_star_material_nodes changes so existing materials get rebuilt.
+STAR_MATERIAL_VERSION = 1
+
+# Corners of a unit-area quad in the XY plane, centred on the origin. Face
+# instancing places a star at each face centre, scaled by sqrt(face area)
+# times the instancer's instance_faces_scale.
+QUAD_CORNERS = np.array((
+    (-0.5, -0.5, 0.0),
+    (0.5, -0.5, 0.0),
+    (0.5, 0.5, 0.0),
+    (-0.5, 0.5, 0.0),
+))
 
 
 def ensure_collection(scene: bpy.types.Scene, name: str) -> bpy.types.Collection:
@@ -52,9 +56,31 @@ def ensure_collection(scene: bpy.types.Scene, name: str) -> bpy.types.Collection
     return collection
 
 
-def clear_collection(collection: bpy.types.Collection) -> None:
-    for obj in list(collection.objects):
-        bpy.data.objects.remove(obj, do_unlink=True)
+def clear_collection(collection: bpy.types.Collection, keep: Tuple[bpy.types.Object, ...] = ()) -> None:
+    removed = [obj for obj in collection.objects if obj not in keep]
+
+    # Instancer meshes only exist to hold star quads, so free them together
+    # with their last user instead of leaving them behind as orphan data.
+    instancer_meshes = {}
+    for obj in removed:
+        if obj.type == 'MESH' and obj.instance_type == 'FACES':
+            mesh, user_count = instancer_meshes.get(obj.data.name, (obj.data, 0))
+            instancer_meshes[obj.data.name] = (mesh, user_count + 1)
+    removed.extend(mesh for mesh, user_count in instancer_meshes.values() if mesh.users == user_count)
+
+    bpy.data.batch_remove(ids=removed)
+
+
+def find_star_instancer(
+    collection: bpy.types.Collection, mesh: bpy.types.Mesh
+) -> Optional[Tuple[bpy.types.Object, bpy.types.Object]]:
+    for obj in collection.objects:
+        parent = obj.parent
+        if obj.data != mesh or parent is None:
+            continue
+        if parent.instance_type == 'FACES' and parent.name in collection.objects:
+            return parent, obj
+    return None
 
 
 def ensure_star_mesh() -> bpy.types.Mesh:
@@ -64,19 +90,60 @@ def ensure_star_mesh() -> bpy.types.Mesh:
 
     mesh = bpy.data.meshes.new(STAR_MESH_NAME)
     bm = bmesh.new()
-    bmesh.ops.create_icosphere(bm, subdivisions=2, radius=0.5)
+    bmesh.ops.create_icosphere(bm, subdivisions=1, radius=0.5)
     bm.to_mesh(mesh)
     bm.free()
     mesh.use_auto_smooth = False
     return mesh
 
 
+def fill_instancer_mesh(
+    mesh: bpy.types.Mesh, positions: np.ndarray, scales: np.ndarray, quad_scale: float = 1.0
+) -> None:
+    star_count = len(positions)
+    corners = positions[:, None, :] + (scales * quad_scale)[:, None, None] * QUAD_CORNERS
+    corner_count = star_count * len(QUAD_CORNERS)
+
+    mesh.clear_geometry()
+    mesh.vertices.add(corner_count)
+    mesh.vertices.foreach_set("co", corners.astype(np.float32).ravel())
+
+    mesh.loops.add(corner_count)
+    mesh.loops.foreach_set("vertex_index", np.arange(corner_count, dtype=np.int32))
+
+    mesh.polygons.add(star_count)
+    mesh.polygons.foreach_set("loop_start", np.arange(0, corner_count, len(QUAD_CORNERS), dtype=np.int32))
+    if not bpy.types.MeshPolygon.bl_rna.properties["loop_total"].is_readonly:
+        mesh.polygons.foreach_set("loop_total", np.full(star_count, len(QUAD_CORNERS), dtype=np.int32))
+
+    mesh.update(calc_edges=True)
+
+
 def ensure_star_material(settings: StarfieldSettings) -> bpy.types.Material:
     material = bpy.data.materials.get(STAR_MATERIAL_NAME)
     if material is None:
         material = bpy.data.materials.new(STAR_MATERIAL_NAME)
         material.use_nodes = True
 
+    # The graph is only rebuilt when its version changes, so edits made to the
+    # material by hand survive regeneration. Otherwise just the two brightness
+    # inputs are updated, if those nodes are still there.
+    if material.get("_starfield_version") != STAR_MATERIAL_VERSION:
+        build_star_material_nodes(material)
+        material["_starfield_version"] = STAR_MATERIAL_VERSION
+
+    nodes = material.node_tree.nodes
+    brightness_scale_node = nodes.get(BRIGHTNESS_SCALE_NODE_NAME)
+    if brightness_scale_node is not None:
+        brightness_scale_node.inputs[1].default_value = settings.brightness_variation
+    brightness_add_node = nodes.get(BRIGHTNESS_ADD_NODE_NAME)
+    if brightness_add_node is not None:
+        brightness_add_node.inputs[1].default_value = settings.base_brightness
+
+    return material
+
+
+def build_star_material_nodes(material: bpy.types.Material) -> None:
     node_tree = material.node_tree
     nodes = node_tree.nodes
     links = node_tree.links
@@ -93,13 +160,13 @@ def ensure_star_material(settings: StarfieldSettings) -> bpy.types.Material:
     object_info_node.location = (-600, 0)
 
     brightness_scale_node = nodes.new("ShaderNodeMath")
+    brightness_scale_node.name = BRIGHTNESS_SCALE_NODE_NAME
     brightness_scale_node.operation = 'MULTIPLY'
-    brightness_scale_node.inputs[1].default_value = settings.brightness_variation
     brightness_scale_node.location = (-200, -160)
 
     brightness_add_node = nodes.new("ShaderNodeMath")
+    brightness_add_node.name = BRIGHTNESS_ADD_NODE_NAME
     brightness_add_node.operation = 'ADD'
-    brightness_add_node.inputs[1].default_value = settings.base_brightness
     brightness_add_node.location = (40, -160)
 
     color_ramp_node = nodes.new("ShaderNodeValToRGB")
@@ -133,44 +200,62 @@ def ensure_star_material(settings: StarfieldSettings) -> bpy.types.Material:
         material.use_shadow = False
     material.use_backface_culling = False
 
-    return material
-
-
-def random_point_in_sphere(radius: float) -> Vector:
-    while True:
-        point = Vector((
-            random.uniform(-1.0, 1.0),
-            random.uniform(-1.0, 1.0),
-            random.uniform(-1.0, 1.0),
-        ))
-        if point.length <= 1.0:
-            return point * radius
-
-
-def generate_starfield(context: bpy.types.Context, settings: StarfieldSettings) -> None:
-    random.seed(settings.random_seed)
 
+def materialize_starfield(
+    context: bpy.types.Context,
+    settings: StarfieldSettings,
+    positions: np.ndarray,
+    scales: np.ndarray,
+) -> None:
     collection = ensure_collection(context.scene, settings.collection_name)
 
-    if settings.clear_existing:
-        clear_collection(collection)
-
     mesh = ensure_star_mesh()
     material = ensure_star_material(settings)
 
-    has_material = any(mat == material for mat in mesh.materials)
-    if not has_material:
+    if not mesh.materials or mesh.materials[0] != material:
         mesh.materials.clear()
         mesh.materials.append(material)
 
-    for i in range(settings.star_count):
-        star_object = bpy.data.objects.new(f"Star_{i:05d}", mesh)
-        star_object.location = random_point_in_sphere(settings.field_radius)
+    # Regenerating reuses the previous field's objects and only rewrites the
+    # instancer geometry, instead of deleting and recreating them.
+    existing = None
+    if settings.clear_existing:
+        existing = find_star_instancer(collection, mesh)
+        clear_collection(collection, keep=existing or ())
+
+    if existing is not None:
+        instancer = existing[0]
+    else:
+        # All stars live in one mesh as instanced faces, so Blender only has to
+        # track two objects no matter how many stars are generated.
+        instancer = bpy.data.objects.new(STAR_INSTANCER_NAME, bpy.data.meshes.new(STAR_INSTANCER_NAME))
+        instancer.instance_type = 'FACES'
+        instancer.use_instance_faces_scale = True
+        instancer.show_instancer_for_viewport = False
+        instancer.show_instancer_for_render = False
+        collection.objects.link(instancer)
+
+        star_object = bpy.data.objects.new(STAR_OBJECT_NAME, mesh)
+        star_object.parent = instancer
+        collection.objects.link(star_object)
+
+    # Corners are stored as float32 at the stars' absolute positions, so tiny
+    # quads far from the origin would lose their size to rounding. Write them
+    # enlarged and shrink the instances back by the same factor instead.
+    faces_scale_range = instancer.bl_rna.properties["instance_faces_scale"]
+    quad_scale = min(max(settings.field_radius, 1.0), 1.0 / faces_scale_range.hard_min)
+    instancer.instance_faces_scale = 1.0 / quad_scale
 
-        star_scale = random.uniform(settings.star_size_min, settings.star_size_max)
-        star_object.scale = (star_scale, star_scale, star_scale)
+    fill_instancer_mesh(instancer.data, positions, scales, quad_scale)
 
-        collection.objects.link(star_object)
+
+# Generation time is bound by Python and bpy overhead per star, not by the
+# arithmetic or memory bandwidth of sampling. That is why sampling is done in
+# NumPy batches and all stars go into a single instanced mesh. SIMD or GPU
+# sampling would not make it noticeably faster.
+def generate_starfield(context: bpy.types.Context, settings: StarfieldSettings) -> None:
+    positions, scales = sample_starfield(settings)
+    materialize_starfield(context, settings, positions, scales)
 
 
 class STARFIELD_OT_generate(Operator):
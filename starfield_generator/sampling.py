@@ -0,0 +1,39 @@
+"""Star field sampling that does not depend on Blender."""
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+
+@dataclass
+class StarfieldSettings:
+    star_count: int
+    field_radius: float
+    star_size_min: float
+    star_size_max: float
+    base_brightness: float
+    brightness_variation: float
+    collection_name: str
+    clear_existing: bool
+    random_seed: int
+
+
+def sample_starfield(settings: StarfieldSettings) -> Tuple[np.ndarray, np.ndarray]:
+    star_count = settings.star_count
+
+    # Positions and scales get independent streams derived from the seed, so
+    # changing how one of them is sampled never shifts the other.
+    seed_sequence = np.random.SeedSequence(settings.random_seed)
+    position_rng, scale_rng = (np.random.default_rng(seed) for seed in seed_sequence.spawn(2))
+
+    # Sample every star in one batch rather than one Python call per star.
+    # Normalisation and radial scaling are folded into one per-star factor so
+    # the positions array is only rewritten once.
+    positions = position_rng.standard_normal((star_count, 3))
+    radial_scale = settings.field_radius * position_rng.random(star_count) ** (1.0 / 3.0)
+    radial_scale /= np.linalg.norm(positions, axis=1)
+    positions *= radial_scale[:, None]
+    scales = scale_rng.uniform(settings.star_size_min, settings.star_size_max, star_count)
+
+    return positions, scales
@@ -0,0 +1,81 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+
+# Load the sampling module by path: importing the package itself pulls in bpy,
+# which is only available inside Blender.
+_SAMPLING_PATH = Path(__file__).resolve().parents[1] / "starfield_generator" / "sampling.py"
+_spec = importlib.util.spec_from_file_location("starfield_sampling", _SAMPLING_PATH)
+sampling = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sampling)
+
+
+def make_settings(**overrides):
+    values = dict(
+        star_count=5000,
+        field_radius=50.0,
+        star_size_min=0.02,
+        star_size_max=0.15,
+        base_brightness=3.0,
+        brightness_variation=8.0,
+        collection_name="Starfield",
+        clear_existing=True,
+        random_seed=0,
+    )
+    values.update(overrides)
+    return sampling.StarfieldSettings(**values)
+
+
+def test_sample_starfield_shapes():
+    positions, scales = sampling.sample_starfield(make_settings())
+
+    assert positions.shape == (5000, 3)
+    assert scales.shape == (5000,)
+
+
+def test_sample_starfield_stays_within_bounds():
+    settings = make_settings(field_radius=12.5)
+    positions, scales = sampling.sample_starfield(settings)
+
+    assert np.all(np.linalg.norm(positions, axis=1) <= settings.field_radius + 1e-9)
+    assert np.all(scales >= settings.star_size_min)
+    assert np.all(scales <= settings.star_size_max)
+
+
+def test_sample_starfield_is_uniform_in_volume():
+    settings = make_settings(star_count=20000, field_radius=10.0)
+    positions, _ = sampling.sample_starfield(settings)
+    radii = np.linalg.norm(positions, axis=1)
+
+    # Uniform in the ball means P(r <= R/2) = 1/8 and a median radius of
+    # R * 0.5 ** (1/3); uniform radii would put half the stars in the inner half.
+    assert abs(np.mean(radii <= settings.field_radius / 2) - 1 / 8) < 0.01
+    assert abs(np.median(radii) - settings.field_radius * 0.5 ** (1 / 3)) < 0.01 * settings.field_radius
+
+
+def test_sample_starfield_is_reproducible_per_seed():
+    first_positions, first_scales = sampling.sample_starfield(make_settings(random_seed=7))
+    second_positions, second_scales = sampling.sample_starfield(make_settings(random_seed=7))
+    other_positions, _ = sampling.sample_starfield(make_settings(random_seed=8))
+
+    np.testing.assert_array_equal(first_positions, second_positions)
+    np.testing.assert_array_equal(first_scales, second_scales)
+    assert not np.array_equal(first_positions, other_positions)
+
+
+def test_sample_starfield_streams_are_independent():
+    positions, scales = sampling.sample_starfield(make_settings(random_seed=3))
+    resized_positions, resized_scales = sampling.sample_starfield(
+        make_settings(random_seed=3, star_size_min=0.5, star_size_max=2.0)
+    )
+    rescaled_positions, rescaled_scales = sampling.sample_starfield(
+        make_settings(random_seed=3, field_radius=500.0)
+    )
+
+    # Size settings must not move the stars, and the field radius must not
+    # change their sizes.
+    np.testing.assert_array_equal(positions, resized_positions)
+    assert not np.array_equal(scales, resized_scales)
+    np.testing.assert_array_equal(scales, rescaled_scales)
+    assert not np.array_equal(positions, rescaled_positions)